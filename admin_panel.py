@@ -1,30 +1,123 @@
 #!/usr/bin/env python3
 import os
 import sys
+import atexit
 import time
 import json
-import uuid
+import hmac
+import hashlib
 import logging
 import re
+import secrets
+import shutil
+import signal
 import subprocess
+import tempfile
 import traceback
 import datetime
+import functools
+import io
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import NamedTuple
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, jsonify, make_response
+from werkzeug.formparser import FormDataParser
 from werkzeug.utils import secure_filename
-from github_helper import pull_latest, commit_and_push
+from github_helper import pull_latest, queue_commit, pending_commits, push_status, start_commit_worker, stop_commit_worker
+from github_client import RateLimitedClient
 from flask_socketio import SocketIO
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; tunnel map writes are then only locked in-process
+    fcntl = None
+
+try:
+    from flask_limiter import Limiter
+except ImportError:
+    Limiter = None
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 SERVER_CONFIGS_DIR = 'server_configs'
 UPLOADS_DIR = 'uploads'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Request bodies larger than this are parsed straight into a temp file
+UPLOAD_MEMORY_LIMIT = 500 * 1024
+# Largest request body accepted, big enough for modded server JARs
+MAX_UPLOAD_SIZE = 512 * 1024 * 1024
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
-REPO_OWNER = os.environ.get('GITHUB_REPOSITORY', '').split('/')[0] if '/' in os.environ.get('GITHUB_REPOSITORY', '') else ''
-REPO_NAME = os.environ.get('GITHUB_REPOSITORY', '').split('/')[1] if '/' in os.environ.get('GITHUB_REPOSITORY', '') else ''
+REPO_OWNER, _, REPO_NAME = os.environ.get('GITHUB_REPOSITORY', '').partition('/')
 GITHUB_API = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}"
+# (connect, read) timeout for outbound HTTP calls so a dead socket can't pin
+# a request thread; requests has no default timeout
+HTTP_TIMEOUT = (3.05, 10)
+# Without a token and a repository every Actions call would just fail
+_GH_ENABLED = bool(GITHUB_TOKEN and REPO_OWNER and REPO_NAME)
+GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+WORKFLOW_RECONCILE_INTERVAL = 60
+# How long a polled workflow list is reused when webhooks are not configured
+WORKFLOW_POLL_TTL = 10
+
+_GH_BASE_HEADERS = MappingProxyType({
+    'Accept': 'application/vnd.github+json',
+    'X-GitHub-Api-Version': '2022-11-28'
+})
+
+# Shared session for GitHub API calls: keeps the connection alive between
+# calls and attaches the auth headers once instead of on every request
+gh_session = requests.Session()
+# Gateway errors are retried by the adapter on idempotent requests; the final
+# response is returned rather than raised so callers can log its status
+gh_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+))
+gh_session.headers.update(_GH_BASE_HEADERS)
+if GITHUB_TOKEN:
+    gh_session.headers['Authorization'] = f'Bearer {GITHUB_TOKEN}'
+github = RateLimitedClient(gh_session, GITHUB_API, timeout=HTTP_TIMEOUT)
+
+# Workflow dispatches run here so request handlers can redirect straight away
+_dispatch_executor = ThreadPoolExecutor(max_workers=4)
+# dispatch ID -> Future of send_github_dispatch, for /api/dispatch/<id>/status
+_dispatches = {}
+_dispatches_lock = threading.Lock()
+MAX_TRACKED_DISPATCHES = 100
+
+# The dashboard's GitHub workflow lookup runs here alongside the config scan
+_page_executor = ThreadPoolExecutor(max_workers=4)
+
+# JAR downloads run here; server_id -> latest download state for the status API
+_download_executor = ThreadPoolExecutor(max_workers=2)
+# Separate pooled session so repeat downloads from the same host (Paper,
+# GitHub releases) skip the TLS handshake; reads get a longer timeout
+_jar_session = requests.Session()
+_jar_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=Retry(total=3, backoff_factor=0.3))
+_jar_session.mount('https://', _jar_adapter)
+_jar_session.mount('http://', _jar_adapter)
+JAR_DOWNLOAD_TIMEOUT = (5, 60)
+# Copy buffer for JAR downloads; bigger means fewer read/write calls
+JAR_DOWNLOAD_CHUNK = 1 << 20
+_jar_downloads = {}
+_jar_downloads_lock = threading.Lock()
 
 CLOUDFLARE_API_TOKEN = os.environ.get("CLOUDFLARE_API_TOKEN")
 CLOUDFLARE_ZONE_ID = os.environ.get("CLOUDFLARE_ZONE_ID")
@@ -32,15 +125,131 @@ CLOUDFLARE_API_BASE = "https://api.cloudflare.com/client/v4"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Server types offered on the create page. Built once at import as
+# immutable tuples so they can be shared between request threads.
+class ServerType(NamedTuple):
+    name: str
+    download_url: str
+    supports_plugins: bool
+    supports_mods: bool
+    java_args: str
+
+_RAW_SERVER_TYPES = {
+    'vanilla': {
+        'name': 'Vanilla',
+        'download_url': 'https://piston-data.mojang.com/v1/objects/8dd1a28015f51b1803213892b50b7b4fc76e594d/server.jar',
+        'supports_plugins': False,
+        'supports_mods': False,
+        'java_args': '-Xmx{memory} -Xms{memory}'
+    },
+    'paper': {
+        'name': 'Paper',
+        'download_url': 'https://api.papermc.io/v2/projects/paper/versions/1.21.4/builds/389/downloads/paper-1.21.4-389.jar',
+        'supports_plugins': True,
+        'supports_mods': False,
+        'java_args': '-Xmx{memory} -Xms{memory} -XX:+UseG1GC -XX:+ParallelRefProcEnabled -XX:MaxGCPauseMillis=200'
+    },
+    'forge': {
+        'name': 'Forge',
+        'download_url': 'https://maven.minecraftforge.net/net/minecraftforge/forge/1.21.4-49.0.11/forge-1.21.4-49.0.11-installer.jar',
+        'supports_plugins': False,
+        'supports_mods': True,
+        'java_args': '-Xmx{memory} -Xms{memory} -XX:+UseG1GC'
+    },
+    'fabric': {
+        'name': 'Fabric',
+        'download_url': 'https://maven.fabricmc.net/net/fabricmc/fabric-installer/1.1.0/fabric-installer-1.1.0.jar',
+        'supports_plugins': False,
+        'supports_mods': True,
+        'java_args': '-Xmx{memory} -Xms{memory}'
+    },
+    'bedrock': {
+        'name': 'Bedrock',
+        'download_url': 'https://minecraft.azureedge.net/bin-linux/bedrock-server-1.21.41.01.zip',
+        'supports_plugins': False,
+        'supports_mods': False,
+        'java_args': ''
+    }
+}
+SERVER_TYPES = MappingProxyType({key: ServerType(**info) for key, info in _RAW_SERVER_TYPES.items()})
+
+def ttl_cache(seconds):
+    """
+    Cache a function's result per positional arguments for `seconds`.
+    On a miss only one thread calls through; concurrent callers wait for it.
+    """
+    def decorator(func):
+        cache = {}    # args -> (value, expires_at)
+        pending = {}  # args -> Event set once the in-flight call finishes
+        lock = threading.Lock()
+        # Bumped by cache_clear() so a call already in flight doesn't store
+        # a result from before the change that caused the clear
+        generation = 0
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            while True:
+                with lock:
+                    entry = cache.get(args)
+                    if entry is not None and entry[1] > time.monotonic():
+                        return entry[0]
+                    event = pending.get(args)
+                    if event is None:
+                        event = pending[args] = threading.Event()
+                        started = generation
+                        break
+                # If the leading call raised, loop round and try ourselves
+                event.wait()
+            try:
+                value = func(*args)
+                with lock:
+                    if generation == started:
+                        cache[args] = (value, time.monotonic() + seconds)
+                return value
+            finally:
+                with lock:
+                    pending.pop(args, None)
+                event.set()
+
+        def cache_clear():
+            nonlocal generation
+            with lock:
+                generation += 1
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
 def get_cloudflare_headers():
     return {
         "Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}",
         "Content-Type": "application/json"
     }
 
+# Shared session for Cloudflare DNS calls, a create or delete makes several
+# in a row and this keeps them on one TLS connection
+cf_session = requests.Session()
+# Cloudflare rate limits (429) and gateway errors are retried with back-off
+# for idempotent calls; the last response is returned for the caller to check
+cf_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+cf_session.headers.update(get_cloudflare_headers())
+
+# A server create or delete looks the CNAMEs up several times in a row
+CNAME_LIST_TTL = 30
+# Numbered pool records, e.g. minecraft-007.rileyberycz.co.uk
+_MINECRAFT_CNAME_RE = re.compile(r"minecraft-(\d{3})\.rileyberycz\.co\.uk")
+
+@ttl_cache(CNAME_LIST_TTL)
 def list_minecraft_cnames():
-    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records?type=CNAME&per_page=100"
-    resp = requests.get(url, headers=get_cloudflare_headers())
+    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records"
+    # Let Cloudflare filter by prefix rather than sending every CNAME in the zone
+    params = {"type": "CNAME", "name.startswith": "minecraft-", "per_page": 100}
+    resp = cf_session.get(url, params=params, timeout=HTTP_TIMEOUT)
     resp.raise_for_status()
     records = resp.json()["result"]
     return [r for r in records if r["name"].startswith("minecraft-")]
@@ -54,34 +263,58 @@ def create_cname(subdomain, target):
         "ttl": 120,
         "proxied": False
     }
-    resp = requests.post(url, headers=get_cloudflare_headers(), json=data)
+    resp = cf_session.post(url, json=data, timeout=HTTP_TIMEOUT)
     resp.raise_for_status()
+    list_minecraft_cnames.cache_clear()
     print(f"Created CNAME {subdomain}.rileyberycz.co.uk -> {target}")
     return resp.json()["result"]
 
-def rename_cname(old_subdomain, new_subdomain):
-    records = list_minecraft_cnames()
-    cname_record = next((r for r in records if r["name"] == f"{old_subdomain}.rileyberycz.co.uk"), None)
-    if not cname_record:
-        return False
-    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records/{cname_record['id']}"
+def get_record_by_name(fqdn):
+    """Fetch a single CNAME record by its full name, or None if there isn't one."""
+    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records"
+    resp = cf_session.get(url, params={"type": "CNAME", "name": fqdn}, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    result = resp.json()["result"]
+    return result[0] if result else None
+
+def rename_cname(record_id, content, new_subdomain):
+    """Point an existing CNAME record at a new name, keeping its target."""
+    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records/{record_id}"
     data = {
         "type": "CNAME",
         "name": f"{new_subdomain}.rileyberycz.co.uk",
-        "content": cname_record["content"],
+        "content": content,
         "ttl": 120,
         "proxied": False
     }
-    resp = requests.put(url, headers=get_cloudflare_headers(), json=data)
+    resp = cf_session.put(url, json=data, timeout=HTTP_TIMEOUT)
     resp.raise_for_status()
-    print(f"Renamed CNAME {old_subdomain} to {new_subdomain}")
+    list_minecraft_cnames.cache_clear()
+    print(f"Renamed CNAME {record_id} to {new_subdomain}")
     return True
 
-def get_next_free_minecraft_number():
-    records = list_minecraft_cnames()
+def rename_cname_by_name(old_subdomain, new_subdomain, records=None):
+    """
+    Rename a CNAME by its current subdomain. The record is taken from records
+    when given (and updated to the new name), else looked up on its own.
+    """
+    old_fqdn = f"{old_subdomain}.rileyberycz.co.uk"
+    if records is not None:
+        cname_record = next((r for r in records if r["name"] == old_fqdn), None)
+    else:
+        cname_record = get_record_by_name(old_fqdn)
+    if not cname_record:
+        return False
+    rename_cname(cname_record["id"], cname_record["content"], new_subdomain)
+    cname_record["name"] = f"{new_subdomain}.rileyberycz.co.uk"
+    return True
+
+def get_next_free_minecraft_number(records=None):
+    if records is None:
+        records = list_minecraft_cnames()
     used_numbers = set()
     for r in records:
-        match = re.match(r"minecraft-(\d{3})\.rileyberycz\.co\.uk", r["name"])
+        match = _MINECRAFT_CNAME_RE.match(r["name"])
         if match:
             used_numbers.add(int(match.group(1)))
     for i in range(1, 101):
@@ -89,55 +322,161 @@ def get_next_free_minecraft_number():
             return f"{i:03d}"
     return None
 
-def recycle_lowest_cname(preferred_subdomain):
+class _MapLock:
+    """
+    Re-entrant thread lock that, at the outermost level, also holds an
+    exclusive flock on `<path>.lock`. The panel runs as a single process, so
+    the flock only matters if a second copy is started on the same checkout.
+    """
+
+    def __init__(self, path):
+        self._rlock = threading.RLock()
+        self._lock_path = f"{path}.lock"
+        self._fd = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._rlock.release()
+
+class TunnelMap:
+    """
+    A tunnel map JSON file kept in memory. It is reloaded only when the
+    file's mtime changes (e.g. after a git pull) and written back atomically.
+    Hold `lock` around multi-step updates and finish them with flush().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = _MapLock(path)
+        self._data = None
+        self._mtime_ns = None
+        self._dirty = False
+
+    def _refresh(self):
+        # Never reload over unflushed changes
+        if self._dirty:
+            return
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns != self._mtime_ns:
+            self._data = read_json(self.path)
+            self._mtime_ns = mtime_ns
+
+    def get(self, key, default=None):
+        with self.lock:
+            self._refresh()
+            return self._data.get(key, default)
+
+    def keys(self):
+        with self.lock:
+            self._refresh()
+            return list(self._data)
+
+    def __contains__(self, key):
+        with self.lock:
+            self._refresh()
+            return key in self._data
+
+    def set(self, key, value):
+        with self.lock:
+            self._refresh()
+            self._data[key] = value
+            self._dirty = True
+
+    def pop(self, key, *default):
+        with self.lock:
+            self._refresh()
+            if key in self._data:
+                self._dirty = True
+            return self._data.pop(key, *default)
+
+    def flush(self):
+        with self.lock:
+            if not self._dirty:
+                return
+            data = dump_json(self._data)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._mtime_ns = os.stat(self.path).st_mtime_ns
+            self._dirty = False
+
+# subdomain FQDN -> Cloudflare tunnel ID
+TUNNEL_ID_MAP = TunnelMap("tunnel_id_map.json")
+# FQDN -> tunnel entry with original_domain/updated_domain
+TUNNEL_MAP = TunnelMap(os.path.join(BASE_DIR, "tunnel_map.json"))
+
+def recycle_lowest_cname(preferred_subdomain, records=None):
     """
     Find the lowest numbered minecraft-XXX CNAME and rename it to the preferred subdomain.
-    Returns the tunnel ID and the new subdomain.
+    Returns the tunnel ID, the new subdomain and the recycled minecraft-XXX
+    subdomain (None if nothing was recycled).
     """
     # Get all minecraft-XXX CNAMEs from Cloudflare
-    records = list_minecraft_cnames()
+    if records is None:
+        records = list_minecraft_cnames()
     used_numbers = []
     
     # Extract the numeric parts and sort them
     for r in records:
-        match = re.match(r"minecraft-(\d{3})\.rileyberycz\.co\.uk", r["name"])
+        match = _MINECRAFT_CNAME_RE.match(r["name"])
         if match:
-            used_numbers.append((int(match.group(1)), r["name"]))
+            used_numbers.append((int(match.group(1)), r))
     
     if not used_numbers:
         logger.error("No minecraft CNAMEs found to recycle!")
-        return None, preferred_subdomain  # Fallback
+        return None, preferred_subdomain, None  # Fallback
     
     # Sort by number to get the lowest
-    used_numbers.sort()
-    lowest_num, old_fqdn = used_numbers[0]
+    used_numbers.sort(key=lambda item: item[0])
+    lowest_num, lowest_record = used_numbers[0]
+    old_fqdn = lowest_record["name"]
     old_subdomain = old_fqdn.split('.')[0]
     
-    # Rename the CNAME in Cloudflare
+    # Rename the CNAME in Cloudflare; we already have its ID and target
     logger.info(f"Renaming CNAME from {old_subdomain} to {preferred_subdomain}")
-    rename_success = rename_cname(old_subdomain, preferred_subdomain)
-    
-    if not rename_success:
-        logger.error(f"Failed to rename CNAME {old_subdomain} -> {preferred_subdomain}")
-        return None, preferred_subdomain  # Fallback
+    try:
+        rename_cname(lowest_record["id"], lowest_record["content"], preferred_subdomain)
+    except requests.RequestException as e:
+        logger.error(f"Failed to rename CNAME {old_subdomain} -> {preferred_subdomain}: {e}")
+        return None, preferred_subdomain, None  # Fallback
+    # Keep the caller's listing in step with the rename
+    lowest_record["name"] = f"{preferred_subdomain}.rileyberycz.co.uk"
     
     # Update the tunnel map
-    with open("tunnel_id_map.json", "r") as f:
-        tunnel_map = json.load(f)
-    
-    # Get the tunnel ID associated with the old name
-    tunnel_id = tunnel_map.pop(old_fqdn)
-    
-    # Add new mapping with the preferred subdomain
-    new_fqdn = f"{preferred_subdomain}.rileyberycz.co.uk"
-    tunnel_map[new_fqdn] = tunnel_id
-    
-    # Save the updated map
-    with open("tunnel_id_map.json", "w") as f:
-        json.dump(tunnel_map, f, indent=2)
+    with TUNNEL_ID_MAP.lock:
+        # Get the tunnel ID associated with the old name
+        tunnel_id = TUNNEL_ID_MAP.pop(old_fqdn)
+        
+        # Add new mapping with the preferred subdomain
+        new_fqdn = f"{preferred_subdomain}.rileyberycz.co.uk"
+        TUNNEL_ID_MAP.set(new_fqdn, tunnel_id)
+        
+        # Save the updated map
+        TUNNEL_ID_MAP.flush()
     
     # Return the tunnel ID and the new subdomain
-    return tunnel_id, preferred_subdomain
+    return tunnel_id, preferred_subdomain, old_subdomain
 
 def recycle_subdomain_to_number(subdomain):
     """
@@ -150,7 +489,7 @@ def recycle_subdomain_to_number(subdomain):
         used_numbers = set()
         
         for r in records:
-            match = re.match(r"minecraft-(\d{3})\.rileyberycz\.co\.uk", r["name"])
+            match = _MINECRAFT_CNAME_RE.match(r["name"])
             if match:
                 used_numbers.add(int(match.group(1)))
         
@@ -169,26 +508,22 @@ def recycle_subdomain_to_number(subdomain):
         new_subdomain = f"minecraft-{next_num:03d}"
         
         # Rename the CNAME in Cloudflare
-        rename_success = rename_cname(subdomain, new_subdomain)
+        rename_success = rename_cname_by_name(subdomain, new_subdomain, records)
         
         if not rename_success:
             logger.error(f"Failed to rename CNAME {subdomain} -> {new_subdomain}")
             return
         
         # Update the tunnel map
-        with open("tunnel_id_map.json", "r") as f:
-            tunnel_map = json.load(f)
-        
         old_fqdn = f"{subdomain}.rileyberycz.co.uk"
-        if old_fqdn in tunnel_map:
-            tunnel_id = tunnel_map.pop(old_fqdn)
-            new_fqdn = f"{new_subdomain}.rileyberycz.co.uk"
-            tunnel_map[new_fqdn] = tunnel_id
-            
-            with open("tunnel_id_map.json", "w") as f:
-                json.dump(tunnel_map, f, indent=2)
-            
-            logger.info(f"Recycled CNAME {subdomain} -> {new_subdomain}")
+        with TUNNEL_ID_MAP.lock:
+            if old_fqdn in TUNNEL_ID_MAP:
+                tunnel_id = TUNNEL_ID_MAP.pop(old_fqdn)
+                new_fqdn = f"{new_subdomain}.rileyberycz.co.uk"
+                TUNNEL_ID_MAP.set(new_fqdn, tunnel_id)
+                TUNNEL_ID_MAP.flush()
+                
+                logger.info(f"Recycled CNAME {subdomain} -> {new_subdomain}")
             
     except Exception as e:
         logger.error(f"Error recycling subdomain {subdomain}: {e}")
@@ -197,43 +532,45 @@ def remove_subdomain_from_tunnel_map(subdomain):
     """Remove subdomain from tunnel map and delete DNS record"""
     try:
         # Remove from tunnel_id_map.json
-        with open("tunnel_id_map.json", "r") as f:
-            tunnel_map = json.load(f)
-        
         fqdn = f"{subdomain}.rileyberycz.co.uk"
-        if fqdn in tunnel_map:
-            del tunnel_map[fqdn]
-            with open("tunnel_id_map.json", "w") as f:
-                json.dump(tunnel_map, f, indent=2)
+        if fqdn in TUNNEL_ID_MAP:
+            with TUNNEL_ID_MAP.lock:
+                TUNNEL_ID_MAP.pop(fqdn, None)
+                TUNNEL_ID_MAP.flush()
             
             # Also delete the DNS record
             if CLOUDFLARE_API_TOKEN and CLOUDFLARE_ZONE_ID:
                 try:
                     # Find and delete the DNS record
-                    url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records?type=CNAME&name={fqdn}"
-                    resp = requests.get(url, headers=get_cloudflare_headers())
-                    resp.raise_for_status()
-                    records = resp.json()["result"]
+                    record = get_record_by_name(fqdn)
                     
-                    if records:
-                        record_id = records[0]["id"]
+                    if record:
+                        record_id = record["id"]
                         delete_url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records/{record_id}"
-                        requests.delete(delete_url, headers=get_cloudflare_headers())
+                        cf_session.delete(delete_url, timeout=HTTP_TIMEOUT)
+                        list_minecraft_cnames.cache_clear()
                         logger.info(f"Deleted CNAME record for {fqdn}")
                 except Exception as e:
                     logger.error(f"Failed to delete Cloudflare CNAME: {e}")
     except Exception as e:
         logger.error(f"Error removing subdomain from tunnel map: {e}")
 
+# Used by sanitize_subdomain(): spaces and underscores become hyphens, other
+# characters outside a DNS label are dropped, and valid names skip both
+_SUBDOMAIN_SEPARATORS_RE = re.compile(r'[\s_]+')
+_SUBDOMAIN_INVALID_RE = re.compile(r'[^a-z0-9\-]')
+_SUBDOMAIN_VALID_RE = re.compile(r'[a-z0-9\-]*')
+
 def sanitize_subdomain(name):
-    base = re.sub(r'[^a-z0-9\-]', '', re.sub(r'[\s_]+', '-', name.lower()))
+    base = name.lower()
+    # Names that are already valid skip both substitutions
+    if not _SUBDOMAIN_VALID_RE.fullmatch(base):
+        base = _SUBDOMAIN_INVALID_RE.sub('', _SUBDOMAIN_SEPARATORS_RE.sub('-', base))
     return f"minecraft-{base}"[:63]
 
 def get_next_available_subdomain():
     used = set()
-    with open("tunnel_id_map.json") as f:
-        tunnel_map = json.load(f)
-    for fqdn in tunnel_map.keys():
+    for fqdn in TUNNEL_ID_MAP.keys():
         if fqdn.startswith("minecraft-") and fqdn.endswith(".rileyberycz.co.uk"):
             used.add(fqdn.split(".")[0])
     for i in range(1, 101):
@@ -251,36 +588,26 @@ def update_tunnel_domain(original_domain, new_domain):
         original_domain: The original domain name (e.g. minecraft-002.rileyberycz.co.uk)
         new_domain: The new domain name that replaces it
     """
-    map_path = os.path.join(BASE_DIR, "tunnel_map.json")
-    
-    # Load current tunnel map
-    with open(map_path, "r") as f:
-        tunnel_map = json.load(f)
-    
     # Check if the original domain exists in the map
     fqdn = f"{original_domain}.rileyberycz.co.uk" if ".rileyberycz.co.uk" not in original_domain else original_domain
     new_fqdn = f"{new_domain}.rileyberycz.co.uk" if ".rileyberycz.co.uk" not in new_domain else new_domain
     
-    if fqdn in tunnel_map:
-        # Save the entry
-        entry = tunnel_map[fqdn]
+    with TUNNEL_MAP.lock:
+        # Remove the old key, keeping its entry
+        entry = TUNNEL_MAP.pop(fqdn, None)
+        if entry is None:
+            print(f"Error: Domain {fqdn} not found in tunnel map")
+            return False
         
-        # Update the entry
+        # Update the entry and add it under the new key
         entry["updated_domain"] = new_fqdn
-        
-        # Remove old key and add new key
-        tunnel_map.pop(fqdn)
-        tunnel_map[new_fqdn] = entry
+        TUNNEL_MAP.set(new_fqdn, entry)
         
         # Save the updated map
-        with open(map_path, "w") as f:
-            json.dump(tunnel_map, f, indent=2)
-            
-        print(f"Updated tunnel map: {fqdn} → {new_fqdn}")
-        return True
-    else:
-        print(f"Error: Domain {fqdn} not found in tunnel map")
-        return False
+        TUNNEL_MAP.flush()
+    
+    print(f"Updated tunnel map: {fqdn} → {new_fqdn}")
+    return True
 
 def revert_tunnel_domain(current_domain):
     """
@@ -289,18 +616,15 @@ def revert_tunnel_domain(current_domain):
     Args:
         current_domain: The current domain name to revert
     """
-    map_path = os.path.join(BASE_DIR, "tunnel_map.json")
-    
-    # Load current tunnel map
-    with open(map_path, "r") as f:
-        tunnel_map = json.load(f)
-    
     # Check if the domain exists in the map
     fqdn = f"{current_domain}.rileyberycz.co.uk" if ".rileyberycz.co.uk" not in current_domain else current_domain
     
-    if fqdn in tunnel_map:
-        # Save the entry
-        entry = tunnel_map[fqdn]
+    with TUNNEL_MAP.lock:
+        entry = TUNNEL_MAP.get(fqdn)
+        if entry is None:
+            print(f"Error: Domain {fqdn} not found in tunnel map")
+            return False
+        
         original_domain = entry["original_domain"]
         
         # Check if this is actually a renamed domain
@@ -309,21 +633,17 @@ def revert_tunnel_domain(current_domain):
             entry["updated_domain"] = ""
             
             # Remove current key and restore original key
-            tunnel_map.pop(fqdn)
-            tunnel_map[original_domain] = entry
+            TUNNEL_MAP.pop(fqdn)
+            TUNNEL_MAP.set(original_domain, entry)
             
             # Save the updated map
-            with open(map_path, "w") as f:
-                json.dump(tunnel_map, f, indent=2)
+            TUNNEL_MAP.flush()
                 
             print(f"Reverted tunnel map: {fqdn} → {original_domain}")
         else:
             print(f"Domain {fqdn} is not renamed, no reversion needed")
             
         return True
-    else:
-        print(f"Error: Domain {fqdn} not found in tunnel map")
-        return False
 
 def revert_server_domain(server_id, subdomain):
     """
@@ -427,11 +747,7 @@ def assign_server_domain(requested_subdomain):
 def update_srv_record_name(old_domain, new_domain):
     """Update an SRV record name from old_domain to new_domain"""
     try:
-        # Get Cloudflare API credentials
-        cf_api_token = os.environ.get("CLOUDFLARE_API_TOKEN")
-        cf_zone_id = os.environ.get("CLOUDFLARE_ZONE_ID")
-        
-        if not cf_api_token or not cf_zone_id:
+        if not CLOUDFLARE_API_TOKEN or not CLOUDFLARE_ZONE_ID:
             print("⚠️ Cloudflare API credentials not found in environment variables")
             return False
         
@@ -440,16 +756,11 @@ def update_srv_record_name(old_domain, new_domain):
         new_record_name = f"_minecraft._tcp.{new_domain}"
         
         # Find the existing SRV record
-        url = f"https://api.cloudflare.com/client/v4/zones/{cf_zone_id}/dns_records"
-        headers = {
-            "Authorization": f"Bearer {cf_api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.get(
+        url = f"{CLOUDFLARE_API_BASE}/zones/{CLOUDFLARE_ZONE_ID}/dns_records"
+        response = cf_session.get(
             url,
-            headers=headers,
-            params={"name": old_record_name}
+            params={"name": old_record_name},
+            timeout=HTTP_TIMEOUT
         )
         
         if response.status_code != 200:
@@ -479,7 +790,7 @@ def update_srv_record_name(old_domain, new_domain):
                     "ttl": 60
                 }
                 
-                response = requests.put(update_url, headers=headers, json=update_data)
+                response = cf_session.put(update_url, json=update_data, timeout=HTTP_TIMEOUT)
                 
                 if response.status_code == 200:
                     print(f"✅ Updated SRV record name from {old_domain} to {new_domain}")
@@ -496,101 +807,462 @@ def update_srv_record_name(old_domain, new_domain):
         print(f"⚠️ Error updating SRV record name: {e}")
         return False
 
-def load_server_configs():
-    global servers
-    pull_latest()
-    servers = {}
-    if os.path.exists(SERVER_CONFIGS_DIR):
-        for filename in os.listdir(SERVER_CONFIGS_DIR):
-            if filename.endswith('.json'):
-                config_path = os.path.join(SERVER_CONFIGS_DIR, filename)
+# Parsed server configs, reused until the file on disk changes
+# server_id -> (st_mtime_ns, parsed config) for each file in SERVER_CONFIGS_DIR
+_config_cache = {}
+_config_lock = threading.Lock()
+# The directory is rescanned at most this often, and only if its mtime moved;
+# git pulls run in the background on their own interval
+CONFIG_RESCAN_INTERVAL = 5
+GIT_PULL_INTERVAL = 60
+# How long shutdown waits for queued commits to be pushed
+COMMIT_FLUSH_TIMEOUT = 120
+_configs_checked_at = None
+_configs_dir_mtime = None
+# Reads and parses config files that changed since the last scan
+_config_read_executor = ThreadPoolExecutor(max_workers=8)
+
+def read_json(path):
+    """Read and parse a JSON file, with orjson when it is installed."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def dump_json(obj):
+    """Serialize to indented JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+def _scan_server_configs():
+    """Re-parse changed config files and rebuild servers/servers_by_name. Call with _config_lock held."""
+    global servers, servers_by_name
+    seen = set()
+    pending = []
+    try:
+        with os.scandir(SERVER_CONFIGS_DIR) as entries:
+            for entry in entries:
+                # is_file() comes from the directory listing, no extra stat
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                server_id = entry.name[:-5]
+                seen.add(server_id)
                 try:
-                    with open(config_path, 'r') as f:
-                        config = json.load(f)
-                    server_id = filename.replace('.json', '')
-                    servers[server_id] = config
+                    mtime = entry.stat().st_mtime_ns
+                    cached = _config_cache.get(server_id)
+                    if cached is None or cached[0] != mtime:
+                        pending.append((server_id, entry.name, mtime,
+                                        _config_read_executor.submit(read_json, entry.path)))
                 except Exception as e:
-                    logger.error(f"Error loading server config {filename}: {e}")
-    return servers
+                    logger.error(f"Error loading server config {entry.name}: {e}")
+    except FileNotFoundError:
+        pass
+    # Changed files are parsed in parallel, after a git pull that can be most of them
+    for server_id, name, mtime, future in pending:
+        try:
+            _config_cache[server_id] = (mtime, future.result())
+        except Exception as e:
+            logger.error(f"Error loading server config {name}: {e}")
+    for server_id in set(_config_cache) - seen:
+        del _config_cache[server_id]
+    servers = {server_id: dict(config) for server_id, (_, config) in _config_cache.items()}
+    # Workflow runs are named after servers; first server wins on duplicates
+    by_name = {}
+    for server_id, config in servers.items():
+        by_name.setdefault(config.get('name'), server_id)
+    servers_by_name = by_name
 
-def get_active_github_workflows():
-    workflows = []
+def invalidate_server_configs():
+    """Make the next load_server_configs() rescan the directory."""
+    global _configs_checked_at, _configs_dir_mtime
+    with _config_lock:
+        _configs_checked_at = None
+        _configs_dir_mtime = None
+
+def load_server_configs(refresh=False):
+    """
+    Return a new servers dict for the caller. The config directory is only
+    rescanned every CONFIG_RESCAN_INTERVAL seconds and when its mtime has
+    changed; refresh=True pulls from git first and forces a rescan.
+    Handlers should work on the returned dict; the module-level servers is
+    only ever rebound to a fresh dict, never modified in place.
+    """
+    global _configs_checked_at, _configs_dir_mtime
+    if refresh:
+        pull_latest()
+        invalidate_server_configs()
+    with _config_lock:
+        now = time.monotonic()
+        if _configs_checked_at is None or now - _configs_checked_at >= CONFIG_RESCAN_INTERVAL:
+            _configs_checked_at = now
+            try:
+                dir_mtime = os.stat(SERVER_CONFIGS_DIR).st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime = None
+            if dir_mtime is None or dir_mtime != _configs_dir_mtime:
+                _configs_dir_mtime = dir_mtime
+                _scan_server_configs()
+        # Hand out copies, request handlers add per-request keys to these
+        return {server_id: dict(config) for server_id, (_, config) in _config_cache.items()}
+
+def _git_pull_worker():
+    while True:
+        time.sleep(GIT_PULL_INTERVAL)
+        try:
+            pull_latest()
+        except Exception as e:
+            logger.error(f"Background git pull failed: {e}")
+        invalidate_server_configs()
+
+def start_git_pull_worker():
+    """Start the daemon thread that pulls from git every GIT_PULL_INTERVAL seconds."""
+    thread = threading.Thread(target=_git_pull_worker, name='git-pull-worker', daemon=True)
+    thread.start()
+    return thread
+
+def new_server_id():
+    """Return a random 8 character hex ID that no existing server uses."""
+    with _config_lock:
+        while True:
+            server_id = secrets.token_hex(4)
+            if server_id not in _config_cache and not os.path.exists(os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")):
+                return server_id
+
+def save_server_config(server_id, config):
+    """Atomically write a server config and update the cache in place."""
+    config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
+    data = dump_json(config)
+    fd, tmp_path = tempfile.mkstemp(dir=SERVER_CONFIGS_DIR, suffix='.tmp')
     try:
-        if not GITHUB_TOKEN:
-            logger.warning("GITHUB_TOKEN not set, cannot fetch workflows")
-            return []
-            
-        headers = {
-            'Authorization': f'token {GITHUB_TOKEN}',
-            'Accept': 'application/vnd.github.v3+json'
+        # Serialize first so the file is written with a single write()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, config_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    with _config_lock:
+        _config_cache[server_id] = (os.stat(config_path).st_mtime_ns, dict(config))
+    invalidate_server_configs()
+
+def update_server_config(server_id, **changes):
+    """
+    Re-read a server config from disk and save it with changes applied.
+    Passed to queue_commit() as apply, so it runs after the worker's pull.
+    """
+    config = read_json(os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json"))
+    config.update(changes)
+    save_server_config(server_id, config)
+
+def _workflow_entry(run):
+    """
+    Reduce a workflow run payload to the fields the panel uses. Only the
+    server name is kept; it is mapped to a server_id when the list is read,
+    so servers created or renamed since the fetch still match.
+    """
+    name = run.get('name') or ''
+    server_name = None
+    if 'server' in name.lower() and ' - ' in name:
+        server_name = name.split(' - ', 1)[1]
+    return {
+        'id': run.get('id'),
+        'name': name,
+        'server_name': server_name,
+        'started_at': run.get('run_started_at'),
+        'url': run.get('html_url')
+    }
+
+def _fetch_active_github_workflows():
+    """Fetch in-progress runs from the REST API. Returns None on failure."""
+    try:
+        params = {
+            'status': 'in_progress',
+            # The API maximum, so all in-progress runs arrive in one response
+            'per_page': 100,
+            # Server and panel runs are only ever started by dispatch
+            'event': 'workflow_dispatch',
+            'exclude_pull_requests': 'true'
         }
-        response = requests.get(f"{GITHUB_API}/actions/runs?status=in_progress", headers=headers)
-        
+        response = github.get('actions/runs', params=params)
+
         if response.status_code == 200:
-            data = response.json()
-            for run in data.get('workflow_runs', []):
-                server_id = None
-                if 'server' in run.get('name', '').lower():
-                    server_name = run.get('name').split(' - ', 1)[1] if ' - ' in run.get('name', '') else ''
-                    for sid, sconfig in servers.items():
-                        if sconfig.get('name') == server_name:
-                            server_id = sid
-                            break
-                workflows.append({
-                    'id': run.get('id'),
-                    'name': run.get('name'),
-                    'server_id': server_id,
-                    'started_at': run.get('run_started_at'),
-                    'url': run.get('html_url')
-                })
-            return workflows
+            # Project each run straight away so the full payload can be freed
+            return [_workflow_entry(run) for run in response.json().get('workflow_runs', [])]
         else:
             logger.error(f"Failed to fetch workflows: {response.status_code}")
-            return []
+            return None
     except Exception as e:
         logger.error(f"Error fetching workflows: {e}")
+        return None
+
+if not _GH_ENABLED:
+    # The token and repository are either present at startup or never, so
+    # decide once here instead of re-checking on every call
+    logger.warning("GITHUB_TOKEN or GITHUB_REPOSITORY not set, cannot fetch workflows")
+
+    def _fetch_active_github_workflows():
         return []
 
+def reconcile_active_workflows():
+    """Resync the webhook-fed workflow state with the REST API, then reschedule."""
+    workflows = _fetch_active_github_workflows()
+    if workflows is not None:
+        with _active_workflows_lock:
+            _active_workflows.clear()
+            _active_workflows.update((w['id'], w) for w in workflows)
+    timer = threading.Timer(WORKFLOW_RECONCILE_INTERVAL, reconcile_active_workflows)
+    timer.daemon = True
+    timer.start()
+
+@ttl_cache(WORKFLOW_POLL_TTL)
+def _poll_active_github_workflows():
+    return _fetch_active_github_workflows()
+
+def _current_active_workflows():
+    """Return the cached workflow entries, without server ids."""
+    if not GITHUB_WEBHOOK_SECRET:
+        # No webhook events arrive to keep the state current, so poll instead;
+        # the cache collapses concurrent page loads into one API call
+        workflows = _poll_active_github_workflows()
+        if workflows is not None:
+            return list(workflows)
+    with _active_workflows_lock:
+        return list(_active_workflows.values())
+
+def _with_server_ids(workflows):
+    """Return copies of the entries with server_id looked up in the current servers_by_name."""
+    by_name = servers_by_name
+    return [dict(w, server_id=by_name.get(w['server_name'])) for w in workflows]
+
+def get_active_github_workflows():
+    return _with_server_ids(_current_active_workflows())
+
+def send_github_dispatch(workflow_file, inputs):
+    """
+    Trigger a workflow_dispatch run. Returns (accepted, error), where error
+    is GitHub's response text (or the exception) when it was not accepted.
+    """
+    if not _GH_ENABLED:
+        logger.error(f"Cannot dispatch {workflow_file}: GitHub access not configured")
+        return False, "GitHub access not configured"
+    data = {
+        'ref': 'main',
+        'inputs': inputs
+    }
+    try:
+        response = github.post(f"actions/workflows/{workflow_file}/dispatches", json=data)
+    except Exception as e:
+        logger.error(f"Error dispatching {workflow_file}: {e}")
+        return False, str(e)
+    if response.status_code == 204:
+        logger.info(f"Dispatched {workflow_file} with inputs {inputs}")
+        return True, None
+    logger.error(f"Failed to dispatch {workflow_file}: {response.status_code} {response.text}")
+    return False, response.text
+
+def queue_github_dispatch(workflow_file, inputs, on_done=None):
+    """
+    Send a workflow dispatch in the background and return an ID to poll it by.
+    on_done, if given, is called with the Future once the dispatch finishes.
+    """
+    dispatch_id = secrets.token_hex(8)
+    future = _dispatch_executor.submit(send_github_dispatch, workflow_file, inputs)
+    if on_done is not None:
+        future.add_done_callback(on_done)
+    with _dispatches_lock:
+        _dispatches[dispatch_id] = future
+        # Forget the oldest finished dispatches once too many are tracked
+        excess = len(_dispatches) - MAX_TRACKED_DISPATCHES
+        if excess > 0:
+            for old_id in [d for d, f in _dispatches.items() if f.done()][:excess]:
+                del _dispatches[old_id]
+    return dispatch_id
+
+def _upload_stream_factory(total_content_length, content_type, filename, content_length=None):
+    """
+    Werkzeug's default spools every upload in a SpooledTemporaryFile; give
+    large ones a real temp file instead so save_upload() can sendfile() it.
+    """
+    if total_content_length is None or total_content_length > UPLOAD_MEMORY_LIMIT:
+        return tempfile.TemporaryFile('rb+')
+    return io.BytesIO()
+
+class UploadFormDataParser(FormDataParser):
+    def __init__(self, stream_factory=None, *args, **kwargs):
+        super().__init__(_upload_stream_factory, *args, **kwargs)
+
+class PanelRequest(Request):
+    form_data_parser_class = UploadFormDataParser
+
+def save_upload(file, path):
+    """
+    Save an uploaded file. Large uploads are parsed into a temp file and
+    copied in-kernel with sendfile(); small ones are copied in chunks.
+    JARs are tens to hundreds of MB.
+    """
+    stream = file.stream
+    in_fd = None
+    if hasattr(os, 'sendfile'):
+        try:
+            in_fd = stream.fileno()
+        except (AttributeError, OSError):
+            pass  # Small uploads are kept in memory
+    if in_fd is not None:
+        try:
+            stream.flush()
+            size = os.fstat(in_fd).st_size
+            with open(path, 'wb') as out:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                    if sent == 0:
+                        raise OSError(f"sendfile stopped after {offset} of {size} bytes")
+                    offset += sent
+            return
+        except OSError as e:
+            # file.save() below rewrites the whole file, nothing partial is kept
+            logger.debug(f"sendfile failed for upload, copying instead: {e}")
+            stream.seek(0)
+    file.save(path, buffer_size=UPLOAD_CHUNK_SIZE)
+
+def ensure_server_dir(server_id):
+    """Return servers/<server_id>, creating it if missing."""
+    server_dir = os.path.join("servers", server_id)
+    # servers/ is created at startup, so a single mkdir is enough
+    try:
+        os.mkdir(server_dir)
+    except FileExistsError:
+        pass
+    return server_dir
+
+def _preallocate(f, response):
+    """Reserve disk space for an uncompressed response body of known length."""
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return  # Content-Length is the compressed size
+    try:
+        total = int(response.headers.get('Content-Length', 0))
+    except ValueError:
+        return
+    if total <= 0:
+        return
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, total)
+        else:
+            f.truncate(total)
+    except OSError:
+        pass  # Not supported by this filesystem; the write still works
+
+def _download_jar(server_id, jar_url):
+    """Fetch a server JAR into servers/<id>, recording the outcome in _jar_downloads."""
+    try:
+        server_dir = ensure_server_dir(server_id)
+        with _jar_session.get(jar_url, stream=True, timeout=JAR_DOWNLOAD_TIMEOUT) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            filename = jar_url.split('/')[-1]
+            if not filename.endswith('.jar'):
+                filename += '.jar'
+            filename = secure_filename(filename)
+            file_path = os.path.join(server_dir, filename)
+            # Download next to the target and swap it in at the end, so a
+            # failed transfer never leaves a truncated JAR behind
+            part_path = file_path + '.part'
+            try:
+                # Pump the raw socket straight into the file; decode_content
+                # still undoes any gzip transfer encoding
+                response.raw.decode_content = True
+                with open(part_path, 'wb') as f:
+                    _preallocate(f, response)
+                    shutil.copyfileobj(response.raw, f, length=JAR_DOWNLOAD_CHUNK)
+                    # Drop any preallocated space the body didn't fill
+                    f.truncate(f.tell())
+                os.replace(part_path, file_path)
+            except BaseException:
+                try:
+                    os.unlink(part_path)
+                except FileNotFoundError:
+                    pass
+                raise
+        queue_commit(file_path, f"Download server JAR for {server_id}")
+        state = {'status': 'done', 'url': jar_url, 'filename': filename}
+        logger.info(f"Downloaded {jar_url} for {server_id}")
+    except Exception as e:
+        logger.error(f"Error downloading JAR for {server_id}: {e}")
+        state = {'status': 'failed', 'url': jar_url, 'error': str(e)}
+    with _jar_downloads_lock:
+        _jar_downloads[server_id] = state
+
 def calculate_memory(max_players):
     memory_mb = 1024 + (max_players * 50)
     memory_mb = ((memory_mb + 511) // 512) * 512
     memory_mb = min(memory_mb, 6144)
     return f"{memory_mb}M"
 
+# Matched against raw cloudflared stderr, so no per-line decode is needed
+_TUNNEL_RE = re.compile(rb'https://[a-z0-9\-]+\.trycloudflare\.com')
+# Upper bound on how long to wait for cloudflared to print its URL
+TUNNEL_STARTUP_TIMEOUT = 15
+# Bytes of unmatched cloudflared output carried into the next read
+CF_URL_TAIL = 256
+# How often to ask ngrok's local API whether the tunnel is up yet
+NGROK_POLL_INTERVAL = 0.25
+# Public URLs found by setup_tunnels; they don't change while the panel runs
+TUNNEL_URLS = {
+    'cloudflare': None,
+    'ngrok': None
+}
+
 def setup_tunnels(port):
     """Set up both cloudflare and ngrok tunnels in parallel"""
     logger.info("Setting up tunnels for admin panel...")
     
-    tunnels = {
-        'cloudflare': None,
-        'ngrok': None
-    }
+    tunnels = TUNNEL_URLS
+    
+    # Set once each URL is known, or its tunnel failed to start
+    cf_ready = threading.Event()
+    ngrok_ready = threading.Event()
     
     # Start Cloudflare Tunnel
     try:
         logger.info(f"Starting cloudflared tunnel for port {port}...")
         cf_process = subprocess.Popen(
             ["cloudflared", "tunnel", "--url", f"http://localhost:{port}"],
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
+            # Only stderr carries the URL; nothing would read stdout
+            stdout=subprocess.DEVNULL, 
+            stderr=subprocess.PIPE
         )
         
         # Start a thread to capture the cloudflare URL
         def capture_cf_url():
-            for line in cf_process.stderr:
-                match = re.search(r'https://[a-z0-9\-]+\.trycloudflare\.com', line)
-                if match:
-                    tunnels['cloudflare'] = match.group(0)
-                    logger.info(f"Cloudflare tunnel established: {tunnels['cloudflare']}")
-                    break
+            buffer = b''
+            try:
+                # Scan whatever is available in chunks rather than line by line
+                while True:
+                    chunk = cf_process.stderr.read1(4096)
+                    if not chunk:
+                        break
+                    buffer += chunk
+                    match = _TUNNEL_RE.search(buffer)
+                    if match:
+                        tunnels['cloudflare'] = match.group(0).decode('ascii')
+                        logger.info(f"Cloudflare tunnel established: {tunnels['cloudflare']}")
+                        break
+                    # Keep enough of the tail for a URL split across two reads
+                    buffer = buffer[-CF_URL_TAIL:]
+            finally:
+                cf_ready.set()
+            # Keep draining stderr, cloudflared logs for as long as it runs
+            # and would block once the pipe buffer filled up
+            while cf_process.stderr.read1(65536):
+                pass
         
         cf_thread = threading.Thread(target=capture_cf_url)
         cf_thread.daemon = True
         cf_thread.start()
     except Exception as e:
         logger.error(f"Error starting Cloudflare tunnel: {e}")
+        cf_ready.set()
     
     # Start ngrok Tunnel
     try:     
@@ -605,6 +1277,8 @@ def setup_tunnels(port):
                 logger.info(f"Starting ngrok tunnel on port {port}...")
                 tunnel = ngrok.connect(port, "http")
                 tunnels['ngrok'] = tunnel.public_url
+                logger.info(f"ngrok tunnel established: {tunnels['ngrok']}")
+                ngrok_ready.set()
             except ImportError:
                 # Fallback to command line ngrok
                 logger.info("pyngrok not available, using command line ngrok...")
@@ -616,65 +1290,53 @@ def setup_tunnels(port):
                     stdout=subprocess.PIPE, 
                     stderr=subprocess.PIPE
                 )
-                # Parse ngrok URL from the API
-                time.sleep(3)  # Give ngrok time to start
-                try:
-                    resp = requests.get("http://localhost:4040/api/tunnels")
-                    data = resp.json()
-                    for tunnel in data.get("tunnels", []):
-                        if tunnel.get("proto") == "https":
-                            tunnels['ngrok'] = tunnel.get("public_url")
-                            break
-                except Exception as e:
-                    logger.error(f"Could not get ngrok URL from API: {e}")
-        
-        logger.info(f"ngrok tunnel established: {tunnels['ngrok']}")
+                
+                # Poll ngrok's local API until it lists the https tunnel
+                def capture_ngrok_url():
+                    deadline = time.monotonic() + TUNNEL_STARTUP_TIMEOUT
+                    try:
+                        while time.monotonic() < deadline and ngrok_process.poll() is None:
+                            try:
+                                resp = requests.get("http://localhost:4040/api/tunnels", timeout=1)
+                                for tunnel in resp.json().get("tunnels", []):
+                                    if tunnel.get("proto") == "https":
+                                        tunnels['ngrok'] = tunnel.get("public_url")
+                                        logger.info(f"ngrok tunnel established: {tunnels['ngrok']}")
+                                        return
+                            except (requests.RequestException, ValueError):
+                                pass  # API not up yet
+                            time.sleep(NGROK_POLL_INTERVAL)
+                        logger.error("Could not get ngrok URL from API")
+                    finally:
+                        ngrok_ready.set()
+                
+                ngrok_thread = threading.Thread(target=capture_ngrok_url)
+                ngrok_thread.daemon = True
+                ngrok_thread.start()
+        else:
+            ngrok_ready.set()
     except Exception as e:
         logger.error(f"Error setting up ngrok tunnel: {e}")
+        ngrok_ready.set()
     
-    # Wait a moment to allow both tunnels to establish
-    time.sleep(5)
+    # Return as soon as both tunnels report in, rather than after a fixed sleep
+    if not cf_ready.wait(timeout=TUNNEL_STARTUP_TIMEOUT):
+        logger.warning(f"Cloudflare tunnel URL not seen after {TUNNEL_STARTUP_TIMEOUT}s")
+    if not ngrok_ready.wait(timeout=TUNNEL_STARTUP_TIMEOUT):
+        logger.warning(f"ngrok tunnel URL not seen after {TUNNEL_STARTUP_TIMEOUT}s")
     
     return tunnels
 
 def get_public_admin_url():
-    """Get the public URL for the admin panel, trying Cloudflare first, then ngrok"""
-    # Try to use an existing tunnel from setup_tunnels
-    # For Cloudflare
-    try:
-        cf_process = subprocess.Popen(
-            ["cloudflared", "tunnel", "url"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        stdout, stderr = cf_process.communicate(timeout=2)
-        for line in stdout.splitlines() + stderr.splitlines():
-            match = re.search(r'https://[a-z0-9\-]+\.trycloudflare\.com', line)
-            if match:
-                return match.group(0)
-    except Exception as e:
-        logger.debug(f"Could not get Cloudflare URL: {e}")
-    
-    # Check for ngrok tunnel
-    try:
-        resp = requests.get("http://localhost:4040/api/tunnels", timeout=1)
-        if resp.status_code == 200:
-            tunnels = resp.json().get("tunnels", [])
-            for tunnel in tunnels:
-                if tunnel.get("proto") == "https":
-                    return tunnel.get("public_url")
-    except Exception as e:
-        logger.debug(f"Could not get ngrok URL: {e}")
-    
-    # If we already have tunnel URLs from main(), use them
+    """Get the public URL for the admin panel, preferring Cloudflare, then ngrok"""
     admin_port = int(os.environ.get('ADMIN_PORT', '8080'))
-    return f"http://localhost:{admin_port}"
+    return TUNNEL_URLS['cloudflare'] or TUNNEL_URLS['ngrok'] or f"http://localhost:{admin_port}"
 
-def get_server_status(server_id):
-    # Existing code to load config
-    config = load_server_config(server_id)
-    
+def get_server_status(server_id, config):
+    """
+    Three-state status of a loaded server: starting, running or stopped.
+    config is the caller's copy from load_server_configs().
+    """
     # Check for active GitHub workflow first
     active_workflows = get_active_github_workflows()
     
@@ -689,16 +1351,91 @@ def get_server_status(server_id):
 app = Flask(__name__, 
             template_folder='admin_panel/templates', 
             static_folder='admin_panel/static')
+app.request_class = PanelRequest
 socketio = SocketIO(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'minecraft-default-secret')
+# Templates don't change while the panel is running, skip the per-render stat()
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+# The environment reads its options when first created, so set the cache size
+# before anything touches app.jinja_env
+app.jinja_options = {**app.jinja_options, 'cache_size': 400}
+app.jinja_env.auto_reload = False
+# Reject oversized uploads from Content-Length before reading the body
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+# Per-IP budget for the routes that write DNS, push to git or dispatch
+# workflows. Limits live in memory, which suits the single process; point
+# RATELIMIT_STORAGE_URI at e.g. redis://localhost:6379 to keep them elsewhere.
+WRITE_RATE_LIMIT = "5/minute"
+
+def client_address():
+    """
+    The visitor's IP. Requests arrive through cloudflared/ngrok on localhost,
+    so for those use the address the tunnel forwarded instead.
+    """
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return request.remote_addr
+    # Cloudflare's edge overwrites CF-Connecting-IP, but ngrok passes client
+    # headers through, so only trust it on requests for the Cloudflare hostname
+    cloudflare_url = TUNNEL_URLS['cloudflare']
+    if cloudflare_url and request.host == cloudflare_url.split('://', 1)[-1]:
+        forwarded = request.headers.get('CF-Connecting-IP')
+        if forwarded:
+            return forwarded
+    # The tunnel appends the address it saw; anything before it came from the client
+    forwarded = request.headers.get('X-Forwarded-For', '').split(',')[-1].strip()
+    return forwarded or request.remote_addr
+
+if Limiter is not None:
+    limiter = Limiter(key_func=client_address, app=app,
+                      storage_uri=os.environ.get('RATELIMIT_STORAGE_URI', 'memory://'))
+    # Only submissions count; opening the create form or delete confirmation doesn't
+    limit_writes = limiter.limit(WRITE_RATE_LIMIT, methods=['POST'])
+else:
+    def limit_writes(func):
+        return func
 
 servers = {}
+servers_by_name = {}
+
+# In-progress workflow runs keyed by run ID. Kept current by the GitHub
+# webhook below, with reconcile_active_workflows() as a periodic fallback.
+_active_workflows = {}
+_active_workflows_lock = threading.Lock()
+
+# One start/stop/delete at a time per server, so double clicks don't
+# dispatch twice or push the same change twice
+_server_locks = {}
+
+def _server_lock(server_id):
+    return _server_locks.setdefault(server_id, threading.Lock())
+
+def exclusive_server_action(view):
+    """Turn away a server action while another one for the same server is running."""
+    @functools.wraps(view)
+    def wrapper(server_id):
+        if server_id not in load_server_configs():
+            # The view reports the unknown id; don't keep a lock for every id posted
+            return view(server_id)
+        lock = _server_lock(server_id)
+        if not lock.acquire(blocking=False):
+            flash('Another action is already in progress for this server.', 'warning')
+            return redirect(url_for('view_server', server_id=server_id))
+        try:
+            return view(server_id)
+        finally:
+            lock.release()
+    return wrapper
 
 @app.route('/')
 def index():
-    load_server_configs()
+    # Fetch the runs while the configs load. They are only mapped to server
+    # ids afterwards, because the load can rebuild servers_by_name
+    workflows_future = _page_executor.submit(_current_active_workflows)
+    # ?refresh=1 pulls from git now instead of waiting for the background pull
+    servers = load_server_configs(refresh=request.args.get('refresh') == '1')
     current_year = datetime.datetime.now().year
-    active_workflows = get_active_github_workflows()
+    active_workflows = _with_server_ids(workflows_future.result())
     active_server_ids = {w.get('server_id') for w in active_workflows}
     for server_id, server in servers.items():
         server['is_active'] = server_id in active_server_ids or server.get('is_active', False)
@@ -718,6 +1455,7 @@ def index():
     )
 
 @app.route('/create-server', methods=['GET', 'POST'])
+@limit_writes
 def create_server():
     if request.method == 'POST':
         server_name = request.form['server_name']
@@ -732,17 +1470,23 @@ def create_server():
         custom_subdomain = request.form.get('custom_subdomain', '')
         
         # Generate server ID
-        server_id = str(uuid.uuid4())[:8]
+        server_id = new_server_id()
         
         # Get user's preferred subdomain
         user_subdomain = custom_subdomain if custom_subdomain else server_name
         user_subdomain = sanitize_subdomain(user_subdomain)
         
+        # The record is renamed by ID, so list the CNAMEs fresh rather than
+        # risk a cached record that was already recycled; the rename keeps
+        # this listing up to date for the calls below
+        records = list_minecraft_cnames.__wrapped__()
+        
         # Always recycle the lowest numbered CNAME
-        tunnel_id, subdomain = recycle_lowest_cname(user_subdomain)
+        tunnel_id, subdomain, recycled_subdomain = recycle_lowest_cname(user_subdomain, records)
         
-        # Update the tunnel map with the new domain
-        original_domain = f"minecraft-{get_next_free_minecraft_number()}"
+        # Update the tunnel map with the new domain, keyed by the name the
+        # recycled record had; only look for a free number if none was recycled
+        original_domain = recycled_subdomain or f"minecraft-{get_next_free_minecraft_number(records)}"
         update_tunnel_domain(original_domain, subdomain)
         
         # Create server config
@@ -767,65 +1511,26 @@ def create_server():
         save_server_config(server_id, server_config)
         
         # Create server directory and README
-        server_dir = os.path.join("servers", server_id)
-        os.makedirs(server_dir, exist_ok=True)
+        server_dir = ensure_server_dir(server_id)
         readme_path = os.path.join(server_dir, "README.md")
         with open(readme_path, "w") as f:
             f.write(f"# {server_name}\n\nServer ID: {server_id}\nType: {server_type}\nCreated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         
-        # Commit changes
-        commit_and_push([
+        # Commit changes in the background so the request isn't held up by git
+        queue_commit([
             os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json"),
             readme_path,
-            os.path.join(BASE_DIR, "tunnel_map.json")  # Use the path directly
+            TUNNEL_MAP.path
         ], f"Add new server config for {server_name} ({server_id})")
         
-        flash(f'Server "{server_name}" created successfully with ID {server_id}!', 'success')
+        flash(f'Server "{server_name}" created with ID {server_id}, publishing to GitHub...', 'success')
         return redirect(url_for('index'))
-        
-    # Define server types for the template
-    SERVER_TYPES = {
-        'vanilla': {
-            'name': 'Vanilla',
-            'download_url': 'https://piston-data.mojang.com/v1/objects/8dd1a28015f51b1803213892b50b7b4fc76e594d/server.jar',
-            'supports_plugins': False,
-            'supports_mods': False,
-            'java_args': '-Xmx{memory} -Xms{memory}'
-        },
-        'paper': {
-            'name': 'Paper',
-            'download_url': 'https://api.papermc.io/v2/projects/paper/versions/1.21.4/builds/389/downloads/paper-1.21.4-389.jar',
-            'supports_plugins': True,
-            'supports_mods': False,
-            'java_args': '-Xmx{memory} -Xms{memory} -XX:+UseG1GC -XX:+ParallelRefProcEnabled -XX:MaxGCPauseMillis=200'
-        },
-        'forge': {
-            'name': 'Forge',
-            'download_url': 'https://maven.minecraftforge.net/net/minecraftforge/forge/1.21.4-49.0.11/forge-1.21.4-49.0.11-installer.jar',
-            'supports_plugins': False,
-            'supports_mods': True,
-            'java_args': '-Xmx{memory} -Xms{memory} -XX:+UseG1GC'
-        },
-        'fabric': {
-            'name': 'Fabric',
-            'download_url': 'https://maven.fabricmc.net/net/fabricmc/fabric-installer/1.1.0/fabric-installer-1.1.0.jar',
-            'supports_plugins': False,
-            'supports_mods': True,
-            'java_args': '-Xmx{memory} -Xms{memory}'
-        },
-        'bedrock': {
-            'name': 'Bedrock',
-            'download_url': 'https://minecraft.azureedge.net/bin-linux/bedrock-server-1.21.41.01.zip',
-            'supports_plugins': False,
-            'supports_mods': False,
-            'java_args': ''
-        }
-    }
+
     return render_template('create_server.html', server_types=SERVER_TYPES)
 
 @app.route('/server/<server_id>')
 def view_server(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         flash(f'Server with ID {server_id} not found!', 'error')
         return redirect(url_for('index'))
@@ -834,76 +1539,81 @@ def view_server(server_id):
     server_dir = os.path.join("servers", server_id)
     properties_path = os.path.join(server_dir, "server.properties")
     
-    if os.path.exists(properties_path):
+    try:
         with open(properties_path, 'r') as f:
             server['server_properties'] = f.read()
-    else:
+    except FileNotFoundError:
         server['server_properties'] = ''
         
     active_workflows = get_active_github_workflows()
     server['is_active'] = any(w.get('server_id') == server_id for w in active_workflows) or server.get('is_active', False)
     
-    if os.path.exists(server_dir):
+    try:
         jar_files = [f for f in os.listdir(server_dir) if f.endswith('.jar') and f != 'server.jar']
         server['has_custom_jar'] = len(jar_files) > 0
         server['custom_jar_name'] = jar_files[0] if server['has_custom_jar'] else None
-    else:
+    except FileNotFoundError:
         server['has_custom_jar'] = False
         
-    config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        server['last_command_response'] = config.get('last_command_response', '')
-    else:
-        server['last_command_response'] = ''
+    server.setdefault('last_command_response', '')
+    server['jar_download'] = _jar_downloads.get(server_id)
         
     return render_template('manage_server.html', 
                           server=server,
                           server_id=server_id,
+                          dispatch_id=request.args.get('dispatch'),
                           REPO_OWNER=REPO_OWNER,
                           REPO_NAME=REPO_NAME)
 
 @app.route('/server/<server_id>/start', methods=['POST'])
+@limit_writes
 def start_server(server_id):
-    load_server_configs()
-    server_type = servers[server_id]['type']
-    workflow_file = f"{server_type}_server.yml"
-    headers = {
-        'Authorization': f'token {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
-    data = {
-        'ref': 'main',
-        'inputs': {'server_id': server_id}
-    }
-    api_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/actions/workflows/{workflow_file}/dispatches"
-    response = requests.post(api_url, headers=headers, json=data)
-    if response.status_code == 204:
-        flash('Server is starting...', 'success')
-    else:
-        flash(f"Failed to start server workflow: {response.text}", 'error')
-    return redirect(url_for('view_server', server_id=server_id))
+    if not _GH_ENABLED:
+        flash('GITHUB_TOKEN or GITHUB_REPOSITORY not set, cannot start server workflow', 'error')
+        return redirect(url_for('view_server', server_id=server_id))
+    # Not exclusive_server_action: the lock is held until the background
+    # dispatch finishes, not just until this request returns
+    lock = _server_lock(server_id)
+    if not lock.acquire(blocking=False):
+        flash('Another action is already in progress for this server.', 'warning')
+        return redirect(url_for('view_server', server_id=server_id))
+    try:
+        servers = load_server_configs()
+        server_type = servers[server_id]['type']
+        workflow_file = f"{server_type}_server.yml"
+        # Don't hold the request open for the GitHub round-trip; the running
+        # workflow shows up through the webhook/reconcile state
+        dispatch_id = queue_github_dispatch(workflow_file, {'server_id': server_id},
+                                            on_done=lambda _: lock.release())
+    except BaseException:
+        lock.release()
+        raise
+    logger.info(f"Queued start of {server_id} as dispatch {dispatch_id}")
+    flash('Server start requested, sending it to GitHub...', 'success')
+    # The manage page polls /api/dispatch/<id>/status and shows GitHub's error if it is rejected
+    return redirect(url_for('view_server', server_id=server_id, dispatch=dispatch_id))
 
 @app.route('/server/<server_id>/stop', methods=['POST'])
+@limit_writes
+@exclusive_server_action
 def stop_server(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         flash(f'Server with ID {server_id} not found!', 'error')
         return redirect(url_for('index'))
+    # The commit worker pulls and then edits the config, so the change is
+    # made to the latest copy without this request waiting on git
     config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    config['shutdown_request'] = True
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=2)
-    commit_and_push(config_path, f"Request shutdown for server {server_id}")
+    queue_commit(config_path, f"Request shutdown for server {server_id}",
+                 apply=functools.partial(update_server_config, server_id, shutdown_request=True))
     flash('Shutdown requested. The server will stop shortly.', 'success')
     return redirect(url_for('view_server', server_id=server_id))
 
 @app.route('/server/<server_id>/delete', methods=['POST', 'GET'])
+@limit_writes
+@exclusive_server_action
 def delete_server(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         flash(f'Server with ID {server_id} not found!', 'error')
         return redirect(url_for('index'))
@@ -913,12 +1623,8 @@ def delete_server(server_id):
 
     if servers[server_id].get('is_active', False):
         config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        config['shutdown_request'] = True
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
-        commit_and_push(config_path, f"Request shutdown for server {server_id}")
+        queue_commit(config_path, f"Request shutdown for server {server_id}",
+                     apply=functools.partial(update_server_config, server_id, shutdown_request=True))
         flash('Shutdown requested. Please wait for the server to stop before deleting.', 'warning')
         return redirect(url_for('view_server', server_id=server_id))
 
@@ -931,23 +1637,23 @@ def delete_server(server_id):
         if revert_server_domain(server_id, subdomain):
             print(f"Reverted domain for {subdomain}")
             
-            # Add server_domains.json to the files to commit
-            domains_path = os.path.join(BASE_DIR, "server_domains.json")
-            if os.path.exists(domains_path):
-                files_to_commit.append(domains_path)
+            # revert_server_domain() only succeeds after rewriting server_domains.json
+            files_to_commit.append(os.path.join(BASE_DIR, "server_domains.json"))
     
-    if os.path.exists(config_path):
+    try:
         os.remove(config_path)
         files_to_commit.append(config_path)
+    except FileNotFoundError:
+        pass
     server_dir = os.path.join("servers", server_id)
-    if os.path.exists(server_dir):
-        import shutil
+    try:
         shutil.rmtree(server_dir)
         files_to_commit.append(server_dir)
+    except FileNotFoundError:
+        pass
     server_name = servers[server_id].get('name', 'Unnamed Server')
-    del servers[server_id]
     print(f"Files to be committed: {files_to_commit}")
-    commit_and_push(files_to_commit, f"Delete server {server_name} ({server_id})")
+    queue_commit(files_to_commit, f"Delete server {server_name} ({server_id})")
     flash(f'Server "{server_name}" has been deleted.', 'success')
     return redirect(url_for('index'))
 
@@ -961,12 +1667,11 @@ def upload_server_jar(server_id):
         flash('No selected file', 'error')
         return redirect(url_for('view_server', server_id=server_id))
     if file and file.filename.endswith('.jar'):
-        server_dir = os.path.join("servers", server_id)
-        os.makedirs(server_dir, exist_ok=True)
+        server_dir = ensure_server_dir(server_id)
         filename = secure_filename(file.filename)
         file_path = os.path.join(server_dir, filename)
-        file.save(file_path)
-        commit_and_push(file_path, f"Upload custom JAR for {server_id}")
+        save_upload(file, file_path)
+        queue_commit(file_path, f"Upload custom JAR for {server_id}")
         flash(f'Server JAR file "{filename}" uploaded successfully', 'success')
     else:
         flash('Invalid file type. Please upload a JAR file.', 'error')
@@ -974,35 +1679,24 @@ def upload_server_jar(server_id):
 
 @app.route('/server/<server_id>/download-jar', methods=['POST'])
 def download_server_jar(server_id):
+    redirect_url = url_for('view_server', server_id=server_id)
     jar_url = request.form.get('jar_url', '')
     if not jar_url:
         flash('Please provide a download URL', 'error')
-        return redirect(url_for('view_server', server_id=server_id))
-    try:
-        server_dir = os.path.join("servers", server_id)
-        os.makedirs(server_dir, exist_ok=True)
-        response = requests.get(jar_url, stream=True)
-        if response.status_code == 200:
-            filename = jar_url.split('/')[-1]
-            if not filename.endswith('.jar'):
-                filename += '.jar'
-            filename = secure_filename(filename)
-            file_path = os.path.join(server_dir, filename)
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            commit_and_push(file_path, f"Download server JAR for {server_id}")
-            flash(f'Server JAR file "{filename}" downloaded successfully', 'success')
-        else:
-            flash(f'Failed to download JAR file: {response.status_code}', 'error')
-    except Exception as e:
-        flash(f'Error downloading JAR file: {str(e)}', 'error')
-    return redirect(url_for('view_server', server_id=server_id))
+        return redirect(redirect_url)
+    with _jar_downloads_lock:
+        if _jar_downloads.get(server_id, {}).get('status') == 'downloading':
+            flash('A JAR download is already running for this server.', 'warning')
+            return redirect(redirect_url)
+        _jar_downloads[server_id] = {'status': 'downloading', 'url': jar_url}
+    # Large JARs take a while; fetch them without holding this request open
+    _download_executor.submit(_download_jar, server_id, jar_url)
+    flash('Downloading server JAR in the background...', 'success')
+    return redirect(redirect_url)
 
 @app.route('/server/<server_id>/send-command', methods=['POST'])
 def send_command(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         flash(f'Server with ID {server_id} not found!', 'error')
         return redirect(url_for('view_server', server_id=server_id))
@@ -1010,19 +1704,16 @@ def send_command(server_id):
     if not command:
         flash('No command entered.', 'error')
         return redirect(url_for('view_server', server_id=server_id))
+    # Edited by the commit worker after its pull, like stop_server()
     config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    config['pending_command'] = command
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=2)
-    commit_and_push(config_path, f"Send command to server {server_id}")
+    queue_commit(config_path, f"Send command to server {server_id}",
+                 apply=functools.partial(update_server_config, server_id, pending_command=command))
     flash(f'Command "{command}" sent to server.', 'success')
     return redirect(url_for('view_server', server_id=server_id))
 
 @app.route('/server/<server_id>/edit-properties', methods=['POST'])
 def edit_properties(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         flash('Server not found.', 'error')
         return redirect(url_for('view_server', server_id=server_id))
@@ -1032,7 +1723,7 @@ def edit_properties(server_id):
     try:
         with open(properties_path, 'w') as f:
             f.write(new_properties)
-        commit_and_push(properties_path, f"Update server.properties for {server_id}")
+        queue_commit(properties_path, f"Update server.properties for {server_id}")
         flash('server.properties updated successfully.', 'success')
     except Exception as e:
         flash(f'Failed to update server.properties: {e}', 'error')
@@ -1041,28 +1732,15 @@ def edit_properties(server_id):
 @app.route('/api/server/<server_id>/status')
 def server_status_api(server_id):
     """API endpoint to get server status"""
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         return jsonify({'error': 'Server not found'}), 404
         
     server = servers[server_id]
-    active_workflows = get_active_github_workflows()
+    status = get_server_status(server_id, server)
     
-    # Get status using our three-state model
-    if any(w.get('server_id') == server_id for w in active_workflows) and not server.get('is_active', False):
-        status = "starting"
-    elif server.get('is_active', False):
-        status = "running"
-    else:
-        status = "stopped"
-    
-    # Get command response
-    config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-    last_command_response = ""
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        last_command_response = config.get('last_command_response', '')
+    # load_server_configs() already re-parsed the file if it changed
+    last_command_response = server.get('last_command_response', '')
         
     return jsonify({
         'server_id': server_id,
@@ -1070,20 +1748,79 @@ def server_status_api(server_id):
         'is_active': status == 'running',
         'last_command_response': last_command_response,
         'connection_info': server.get('tunnel_url', ''),
+        'jar_download': _jar_downloads.get(server_id),
         'timestamp': int(time.time())
     })
 
+@app.route('/api/dispatch/<dispatch_id>/status')
+def dispatch_status_api(dispatch_id):
+    """API endpoint to check whether a queued workflow dispatch reached GitHub"""
+    with _dispatches_lock:
+        future = _dispatches.get(dispatch_id)
+    if future is None:
+        return jsonify({'error': 'Dispatch not found'}), 404
+    error = None
+    if not future.done():
+        status = "pending"
+    else:
+        accepted, error = future.result()
+        status = "sent" if accepted else "failed"
+    return jsonify({'dispatch_id': dispatch_id, 'status': status, 'error': error})
+
+@app.route('/api/git-queue')
+def git_queue_api():
+    """API endpoint reporting how many config changes are still waiting to be pushed"""
+    unpushed, error = push_status()
+    return jsonify({'pending': pending_commits(), 'unpushed': unpushed, 'error': error})
+
+@app.route('/api/webhook/github', methods=['POST'])
+def github_webhook():
+    """Receive workflow_run events so page loads don't have to poll GitHub"""
+    if not GITHUB_WEBHOOK_SECRET:
+        return jsonify({'error': 'Webhook secret not configured'}), 503
+
+    signature = 'sha256=' + hmac.new(GITHUB_WEBHOOK_SECRET.encode(), request.get_data(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, request.headers.get('X-Hub-Signature-256', '')):
+        return jsonify({'error': 'Invalid signature'}), 401
+
+    if request.headers.get('X-GitHub-Event') != 'workflow_run':
+        return jsonify({'status': 'ignored'})
+
+    payload = request.get_json(silent=True) or {}
+    run = payload.get('workflow_run') or {}
+    action = payload.get('action')
+    with _active_workflows_lock:
+        if action == 'in_progress':
+            _active_workflows[run.get('id')] = _workflow_entry(run)
+        elif action == 'completed':
+            _active_workflows.pop(run.get('id'), None)
+    return jsonify({'status': 'ok'})
+
 @app.route('/shutdown', methods=['POST'])
 def shutdown_server_route():
     """Shutdown the admin panel and exit the process."""
     with open("SHUTDOWN_REQUESTED", "w") as f:
         f.write("Shutdown requested at " + str(datetime.datetime.now()))
-    func = request.environ.get('werkzeug.server.shutdown')
-    if func:
-        func()
+    # Signal once the page has been sent (werkzeug.server.shutdown is gone in 2.1+).
+    # Under gunicorn a SIGTERM to the worker only makes the arbiter start a new
+    # one, so stop the arbiter instead; otherwise main()'s SIGTERM handler exits
+    if request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        target = os.getppid()
     else:
-        os._exit(0)  # Fallback: force exit if not running with Werkzeug
-    return render_template('shutdown.html')
+        target = os.getpid()
+    response = make_response(render_template('shutdown.html'))
+    response.call_on_close(lambda: os.kill(target, signal.SIGTERM))
+    return response
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(f'File too large. The maximum upload size is {MAX_UPLOAD_SIZE // (1024 * 1024)} MB.', 'error')
+    return redirect(request.referrer or url_for('index'))
+
+@app.errorhandler(429)
+def too_many_requests(e):
+    flash('Too many requests, please wait a minute and try again.', 'error')
+    return redirect(url_for('index'))
 
 @socketio.on('connect')
 def handle_connect():
@@ -1094,28 +1831,15 @@ def handle_disconnect():
     logger.info('Client disconnected from WebSocket')
 
 def broadcast_server_update(server_id):
-    load_server_configs()
+    servers = load_server_configs()
     if server_id not in servers:
         return
         
     server = servers[server_id]
-    active_workflows = get_active_github_workflows()
-    
-    # Get status
-    if any(w.get('server_id') == server_id for w in active_workflows) and not server.get('is_active', False):
-        status = "starting"
-    elif server.get('is_active', False):
-        status = "running"
-    else:
-        status = "stopped"
+    status = get_server_status(server_id, server)
     
-    # Get command response
-    config_path = os.path.join(SERVER_CONFIGS_DIR, f"{server_id}.json")
-    last_command_response = ""
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        last_command_response = config.get('last_command_response', '')
+    # load_server_configs() already re-parsed the file if it changed
+    last_command_response = server.get('last_command_response', '')
     
     socketio.emit('server_status_update', {
         'server_id': server_id,
@@ -1126,24 +1850,60 @@ def broadcast_server_update(server_id):
         'timestamp': int(time.time())
     })
 
-def main():
-    admin_port = int(os.environ.get('ADMIN_PORT', '8080'))
-    print("GITHUB_TOKEN present:", bool(GITHUB_TOKEN))
-    print("REPO_OWNER:", REPO_OWNER)
-    print("REPO_NAME:", REPO_NAME)
-    for directory in [SERVER_CONFIGS_DIR, "servers", ".github/workflows", 
-                     ".github/workflows/server_templates", UPLOADS_DIR, 
-                     "admin_panel/templates", "admin_panel/static/css"]:
+def _ensure_dirs(paths):
+    """Create the given directories, skipping parents a deeper path already creates."""
+    paths = [os.path.normpath(p) for p in paths]
+    leaves = [p for p in paths if not any(other.startswith(p + os.sep) for other in paths)]
+    for directory in leaves:
         try:
-            if os.path.exists(directory) and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except FileExistsError:
+                # A file is sitting where the directory should be
                 os.rename(directory, f"{directory}.bak")
                 print(f"Renamed existing file '{directory}' to '{directory}.bak'")
-            os.makedirs(directory, exist_ok=True)
+                os.makedirs(directory, exist_ok=True)
             print(f"Directory created/verified: {directory}")
         except Exception as e:
             print(f"Warning: Issue with directory '{directory}': {e}")
+
+def prepare_panel():
+    """Create working directories and start background state; run once per process."""
+    print("GITHUB_TOKEN present:", bool(GITHUB_TOKEN))
+    print("REPO_OWNER:", REPO_OWNER)
+    print("REPO_NAME:", REPO_NAME)
+    _ensure_dirs([SERVER_CONFIGS_DIR, "servers", ".github/workflows",
+                  ".github/workflows/server_templates", UPLOADS_DIR,
+                  "admin_panel/templates", "admin_panel/static/css"])
     
-    load_server_configs()
+    load_server_configs(refresh=True)
+    start_commit_worker()
+    # Runs on any normal interpreter exit, including a gunicorn worker stopping
+    atexit.register(_flush_commit_queue)
+    start_git_pull_worker()
+    # Without a webhook secret pages poll through the TTL cache instead, and
+    # nothing reads the webhook-fed state the reconcile timer maintains
+    if _GH_ENABLED and GITHUB_WEBHOOK_SECRET:
+        reconcile_active_workflows()
+
+    # Warm the template cache before the first request comes in
+    app.jinja_env.get_template('dashboard.html')
+
+def _flush_commit_queue():
+    """Push the commits still queued before the process exits."""
+    if not stop_commit_worker(timeout=COMMIT_FLUSH_TIMEOUT):
+        logger.warning(f"Queued git commits not pushed after {COMMIT_FLUSH_TIMEOUT}s, exiting anyway")
+
+def _handle_sigterm(signum, frame):
+    """Exit through SystemExit so finally blocks, atexit and logging flush run."""
+    logger.info("Shutdown signal received, stopping admin panel")
+    # The atexit hook from prepare_panel() pushes the queued commits
+    sys.exit(0)
+
+def main():
+    admin_port = int(os.environ.get('ADMIN_PORT', '8080'))
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    prepare_panel()
     
     # Set up both tunnels for public access
     tunnel_urls = setup_tunnels(admin_port)
@@ -1165,7 +1925,12 @@ def main():
         print("\n⚠️ WARNING: Failed to establish any tunnels! Admin panel will only be available locally at http://localhost:%d" % admin_port)
     
     # Run Flask app
-    socketio.run(app, host='0.0.0.0', port=admin_port, debug=False)
+    if waitress_serve is not None:
+        # Production WSGI server with a fixed thread pool. Socket.IO clients
+        # fall back to long-polling here, which threading mode supports.
+        waitress_serve(app, host='0.0.0.0', port=admin_port, threads=16, channel_timeout=120)
+    else:
+        socketio.run(app, host='0.0.0.0', port=admin_port, debug=False)
 
 if __name__ == "__main__":
     main()
@@ -53,6 +53,28 @@ function copyToClipboard(text) {
         updateServerStatus(data);
       })
       .catch(error => console.error('Error refreshing status:', error));
+    
+    refreshGitQueue();
+  }
+  
+  // Show how many saved changes are still waiting to be pushed to GitHub
+  function refreshGitQueue() {
+    const gitQueue = document.getElementById('git-queue-status');
+    if (!gitQueue) return;
+    
+    fetch('/api/git-queue')
+      .then(response => response.json())
+      .then(data => {
+        if (data.error) {
+          gitQueue.textContent = data.error;
+          gitQueue.className = 'text-danger';
+        } else {
+          gitQueue.textContent = data.pending ?
+            `${data.pending} change(s) waiting to be pushed to GitHub...` : '';
+          gitQueue.className = '';
+        }
+      })
+      .catch(error => console.error('Error checking git queue:', error));
   }
   
   function updateServerStatus(data) {
@@ -98,6 +120,18 @@ function copyToClipboard(text) {
       setTimeout(() => cmdResponse.classList.remove('highlight-update'), 1500);
     }
     
+    // Update background JAR download progress
+    const jarStatus = document.getElementById('jar-download-status');
+    if (jarStatus && data.jar_download) {
+      if (data.jar_download.status === 'downloading') {
+        jarStatus.textContent = 'Downloading JAR...';
+      } else if (data.jar_download.status === 'done') {
+        jarStatus.textContent = `Downloaded ${data.jar_download.filename}`;
+      } else {
+        jarStatus.textContent = `JAR download failed: ${data.jar_download.error}`;
+      }
+    }
+    
     // Update buttons visibility
     const startBtn = document.getElementById('start-server-btn');
     const stopBtn = document.getElementById('stop-server-btn');
@@ -107,6 +141,30 @@ function copyToClipboard(text) {
     }
   }
   
+  // Follow a queued workflow dispatch until GitHub accepts or rejects it
+  function watchDispatch(dispatchId) {
+    const dispatchStatus = document.getElementById('dispatch-status');
+    if (!dispatchStatus || !dispatchId) return;
+    
+    fetch(`/api/dispatch/${dispatchId}/status`)
+      .then(response => response.json())
+      .then(data => {
+        if (data.status === 'pending') {
+          dispatchStatus.textContent = 'Sending start request to GitHub...';
+          setTimeout(() => watchDispatch(dispatchId), 1000);
+        } else if (data.status === 'sent') {
+          dispatchStatus.textContent = 'Start request accepted by GitHub.';
+        } else if (data.status === 'failed') {
+          dispatchStatus.textContent = `Failed to start server workflow: ${data.error}`;
+          showAlert(dispatchStatus.textContent, 'danger');
+        } else {
+          // Unknown or expired dispatch ID
+          dispatchStatus.textContent = '';
+        }
+      })
+      .catch(error => console.error('Error checking dispatch:', error));
+  }
+  
   // AJAX form handling
   function setupAjaxForms() {
     // Command form submission
@@ -174,9 +232,14 @@ function copyToClipboard(text) {
           method: 'POST',
           body: new FormData(this)
         })
-        .then(response => response.ok ? 
-          { status: 'success', message: `${actionName} request sent` } : 
-          response.json())
+        .then(response => {
+          // Start redirects with the ID of its queued workflow dispatch
+          const dispatchId = new URL(response.url).searchParams.get('dispatch');
+          if (dispatchId) watchDispatch(dispatchId);
+          return response.ok ? 
+            { status: 'success', message: `${actionName} request sent` } : 
+            response.json();
+        })
         .then(data => {
           showAlert(data.message || `${actionName} action processed`, data.status || 'success');
         })
@@ -212,6 +275,12 @@ function copyToClipboard(text) {
     // Set up AJAX form handling
     setupAjaxForms();
     
+    // Report on a start request made before this page loaded
+    const dispatchStatus = document.getElementById('dispatch-status');
+    if (dispatchStatus && dispatchStatus.dataset.dispatchId) {
+      watchDispatch(dispatchStatus.dataset.dispatchId);
+    }
+    
     // Start regular status polling
     const serverId = document.body.dataset.serverId;
     if (serverId) {
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Start waiting for the reset window when fewer calls than this are left
+RATE_LIMIT_BUFFER = 100
+# Never park a request thread longer than this waiting for a reset
+MAX_RATE_LIMIT_WAIT = 60
+# Back-off between retries of server errors and secondary rate limits
+RETRY_DELAYS = (1, 2, 4, 8, 16, 32)
+# Stop retrying once a call has taken this long, so a GitHub outage can't
+# hold a page render for minutes
+MAX_RETRY_TIME = 10
+# Gateway errors the session's transport adapter already retries for GETs
+ADAPTER_RETRIED_STATUSES = (502, 503, 504)
+
+class RateLimitedClient:
+    """
+    Small wrapper around a requests.Session for the GitHub REST API.
+
+    - Reads X-RateLimit-Remaining/X-RateLimit-Reset after every response and
+      waits for the reset when the remaining budget gets low.
+    - Concurrent identical GET requests share a single HTTP call.
+    - GETs are made conditional on the last ETag; a 304 returns the previous
+      response and does not count against the primary rate limit.
+    - GET server errors and secondary rate limits are retried with back-off,
+      honouring Retry-After, for at most MAX_RETRY_TIME seconds. POSTs are
+      not retried on server errors as they may already have taken effect.
+    """
+
+    def __init__(self, session, base_url, timeout=None):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._etags = {}
+        self._remaining = None
+        self._reset_at = 0
+
+    def get(self, path, params=None):
+        """GET a path relative to base_url, sharing the call with identical in-flight GETs."""
+        key = (path, tuple(sorted((params or {}).items())))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            cached = self._etags.get(key)
+            headers = {'If-None-Match': cached[0]} if cached else None
+            response = self._request('GET', path, params=params, headers=headers)
+            if response.status_code == 304 and cached:
+                response = cached[1]
+            elif response.status_code == 200 and 'ETag' in response.headers:
+                self._etags[key] = (response.headers['ETag'], response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def post(self, path, json=None):
+        """POST to a path relative to base_url."""
+        return self._request('POST', path, json=json)
+
+    def _request(self, method, path, **kwargs):
+        self._wait_for_rate_limit()
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        deadline = time.monotonic() + MAX_RETRY_TIME
+        for delay in RETRY_DELAYS + (None,):
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            self._record_rate_limit(response)
+            if delay is None or not self._should_retry(response):
+                return response
+            delay = self._retry_delay(response, delay)
+            if time.monotonic() + delay > deadline:
+                return response
+            logger.warning(f"GitHub {method} {path} returned {response.status_code}, retrying in {delay}s")
+            time.sleep(delay)
+
+    def _should_retry(self, response):
+        if response.status_code >= 500:
+            # A dispatch can be queued before GitHub answers with an error, so
+            # only GETs are retried; connect errors are left to the adapter.
+            # Don't stack our back-off on top of the adapter's gateway retries.
+            return response.request.method == 'GET' and response.status_code not in ADAPTER_RETRIED_STATUSES
+        if response.status_code in (403, 429):
+            # Secondary ("abuse") limits say so in the body or send Retry-After
+            return 'Retry-After' in response.headers or 'secondary rate limit' in response.text.lower()
+        return False
+
+    def _retry_delay(self, response, default):
+        # Retry-After is given in seconds by GitHub; fall back to our schedule
+        retry_after = response.headers.get('Retry-After', '')
+        return int(retry_after) if retry_after.isdigit() else default
+
+    def _record_rate_limit(self, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_at = response.headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset_at is not None:
+            self._remaining = int(remaining)
+            self._reset_at = int(reset_at)
+
+    def _wait_for_rate_limit(self):
+        if self._remaining is None or self._remaining >= RATE_LIMIT_BUFFER:
+            return
+        wait = min(self._reset_at - time.time(), MAX_RATE_LIMIT_WAIT)
+        if wait > 0:
+            logger.warning(f"GitHub rate limit nearly exhausted ({self._remaining} left), waiting {wait:.0f}s")
+            time.sleep(wait)
@@ -1,23 +1,270 @@
 import os
+import queue
+import shutil
+import logging
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Timeouts so a hung git command can't block its caller forever. Pulls and
+# pushes go over the network and can carry world data, so they get longer.
+GIT_TIMEOUT = 30
+GIT_NETWORK_TIMEOUT = 300
+# Commits queued within this many seconds of each other go out as one push
+COMMIT_BATCH_WINDOW = 0.5
+
+# Only one git command may touch the repository at a time
+_git_lock = threading.RLock()
+_commit_queue = queue.Queue()
+_commit_thread = None
+_identity_configured = False
+# Queued by stop_commit_worker(); the worker flushes what it has and exits
+_STOP = object()
+# Outcome of the last push, for push_status()
+_push_error = None
+_unpushed = 0
+
+def _git(*args, timeout=GIT_TIMEOUT):
+    """Run a git command without prompting. Returns the CompletedProcess, or None on timeout."""
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    try:
+        result = subprocess.run(['git', *args], env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"git {args[0]} timed out after {timeout}s")
+        return None
+    if result.returncode != 0:
+        print(f"git {args[0]} failed: {(result.stderr or result.stdout).strip()}")
+    return result
+
+def _configure_identity():
+    """Set the commit author once per process rather than before every commit."""
+    global _identity_configured
+    if not _identity_configured:
+        _git('config', 'user.name', 'GitHub Actions')
+        _git('config', 'user.email', 'actions@github.com')
+        _identity_configured = True
+
+def _pull_rebase():
+    """
+    Pull with rebase. If the rebase stops on a conflict, abort it so the
+    repository isn't left mid-rebase and later pulls and pushes can run.
+    Returns True if the pull succeeded.
+    """
+    result = _git('pull', '--rebase', '--autostash', timeout=GIT_NETWORK_TIMEOUT)
+    if result is not None and result.returncode == 0:
+        return True
+    for state_dir in ('rebase-merge', 'rebase-apply'):
+        path = _git('rev-parse', '--git-path', state_dir)
+        if path is not None and path.returncode == 0 and os.path.isdir(path.stdout.strip()):
+            print("Aborting the conflicted rebase")
+            _git('rebase', '--abort')
+            break
+    return False
+
+def _git_ok(*args, timeout=GIT_TIMEOUT):
+    result = _git(*args, timeout=timeout)
+    return result is not None and result.returncode == 0
+
+def _git_names(*args):
+    """Run a git command that lists paths, one per line."""
+    result = _git(*args)
+    if result is None or result.returncode != 0:
+        return set()
+    return {line for line in result.stdout.splitlines() if line}
+
+def _push():
+    return _git_ok('push', '--no-verify', timeout=GIT_NETWORK_TIMEOUT)
+
+def _restore_from_upstream(path):
+    """Make path match the remote branch, deleting it if the remote doesn't have it."""
+    if _git_names('ls-tree', '--name-only', '@{u}', '--', path):
+        _git('checkout', '@{u}', '--', path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _redo_on_upstream(files, msg, apply=None, apply_files=()):
+    """
+    Drop local commits that conflict with the remote branch and redo them on
+    top of it, then push. Files the panel wrote keep the panel's content;
+    apply_files are reset to the remote version and apply() edits them again.
+    Returns True if the push succeeded.
+    """
+    if not _git_ok('fetch', timeout=GIT_NETWORK_TIMEOUT):
+        return False
+    old_head = _git('rev-parse', 'HEAD')
+    if old_head is None or old_head.returncode != 0:
+        return False
+    old_head = old_head.stdout.strip()
+    # Changed by the panel: in unpushed commits, or written but not committed yet
+    committed = _git_names('diff', '--name-only', '@{u}...HEAD')
+    uncommitted = _git_names('diff', '--name-only', 'HEAD')
+    if not _git_ok('reset', '--mixed', '@{u}'):
+        return False
+    # The working tree still has the old checkout; bring everything else up to date
+    for path in _git_names('diff', '--name-only', old_head, '@{u}') - committed - uncommitted:
+        _restore_from_upstream(path)
+    if apply is not None:
+        for path in apply_files:
+            _restore_from_upstream(path)
+        apply()
+    for path in sorted(committed) + list(files):
+        _git('add', '--', path)
+    _git('commit', '-m', msg)
+    return _push()
+
+def _record_push(pushed):
+    """Remember the outcome of a push attempt for push_status()."""
+    global _push_error, _unpushed
+    result = _git('rev-list', '--count', '@{u}..HEAD')
+    if result is not None and result.returncode == 0:
+        _unpushed = int(result.stdout.strip() or 0)
+    if pushed:
+        _push_error = None
+    else:
+        _push_error = f"Push to GitHub failed, {_unpushed} local commit(s) not pushed"
+        logger.error(_push_error)
+
+def push_status():
+    """Return (unpushed local commits, last push error or None)."""
+    return _unpushed, _push_error
 
 def pull_latest():
     """Pull the latest changes from the remote repository."""
-    os.system('git pull --rebase --autostash')
+    with _git_lock:
+        if _pull_rebase():
+            return
+        # Local commits that conflict would block every later pull; redo them
+        if _git_names('rev-list', '@{u}..HEAD'):
+            _record_push(_redo_on_upstream((), "Redo admin panel changes after a conflict"))
 
-def commit_and_push(files, msg="Update via admin panel"):
+def commit_and_push(files, msg="Update via admin panel", apply=None):
     """
     Commit and push specified files to GitHub with a custom message.
     Args:
         files (str or list): File path(s) to add and commit.
         msg (str): Commit message.
+        apply (callable): Optional; writes the change into the files. It is
+            called after a pull, so it edits the latest version of them,
+            and again if the change has to be redone after a conflict.
     """
     if isinstance(files, str):
         files = [files]
-    os.system('git config user.name "GitHub Actions"')
-    os.system('git config user.email "actions@github.com"')
-    for f in files:
-        os.system(f'git add "{f}"')
-    os.system(f'git commit -m "{msg}" || echo "No changes"')
-    # Always pull before pushing to avoid non-fast-forward errors
-    os.system('git pull --rebase --autostash')
-    os.system('git push')
\ No newline at end of file
+    _commit_and_push(files, msg, apply, files if apply is not None else ())
+
+def _commit_and_push(files, msg, apply, apply_files):
+    with _git_lock:
+        _configure_identity()
+        if apply is not None:
+            _pull_rebase()
+            apply()
+        for f in files:
+            _git('add', f)
+        result = _git('commit', '-m', msg)
+        if result is None or result.returncode != 0:
+            print("No changes")
+        # Always pull before pushing to avoid non-fast-forward errors
+        pushed = False
+        if _pull_rebase():
+            pushed = _push()
+            if not pushed and _pull_rebase():
+                # Someone pushed in between; try once more
+                pushed = _push()
+        if not pushed:
+            # Most likely a conflict with a change made elsewhere. Leaving the
+            # commit in place would make every later pull conflict too
+            logger.error(f"Could not push '{msg.splitlines()[0]}', redoing it on the remote branch")
+            pushed = _redo_on_upstream(files, msg, apply, apply_files)
+        _record_push(pushed)
+
+def queue_commit(files, msg="Update via admin panel", apply=None):
+    """
+    Queue files to be committed and pushed by the background worker. Pass
+    apply for read-modify-write changes; see commit_and_push().
+    """
+    _commit_queue.put((files, msg, apply))
+
+def pending_commits():
+    """Number of queued commits not yet pushed, including one in progress."""
+    return _commit_queue.unfinished_tasks
+
+def _commit_batch(batch):
+    """Commit and push a batch of (files, msg, apply) requests as a single commit."""
+    files = []
+    for item_files, _, _ in batch:
+        for f in [item_files] if isinstance(item_files, str) else item_files:
+            if f not in files:
+                files.append(f)
+    messages = [msg for _, msg, _ in batch]
+    if len(messages) == 1:
+        msg = messages[0]
+    else:
+        msg = f"Update {len(messages)} items via admin panel\n\n" + "\n".join(f"- {m}" for m in messages)
+    appliers = [apply for _, _, apply in batch if apply is not None]
+    apply_files = []
+    for item_files, _, apply in batch:
+        if apply is not None:
+            apply_files.extend([item_files] if isinstance(item_files, str) else item_files)
+
+    def apply_all():
+        for apply in appliers:
+            # One failed change shouldn't hold back the rest of the batch
+            try:
+                apply()
+            except Exception as e:
+                print(f"Queued change failed: {e}")
+
+    _commit_and_push(files, msg, apply_all if appliers else None, apply_files)
+
+def _commit_worker():
+    while True:
+        item = _commit_queue.get()
+        if item is _STOP:
+            _commit_queue.task_done()
+            return
+        # Give bursts of changes a moment to arrive so they share one push
+        batch = [item]
+        stopping = False
+        deadline = time.monotonic() + COMMIT_BATCH_WINDOW
+        while not stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _commit_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+        try:
+            _commit_batch(batch)
+        except Exception as e:
+            print(f"Background commit failed: {e}")
+        finally:
+            for _ in range(len(batch) + stopping):
+                _commit_queue.task_done()
+        if stopping:
+            return
+
+def start_commit_worker():
+    """Start the daemon thread that drains queue_commit() requests, batching bursts."""
+    global _commit_thread
+    _commit_thread = threading.Thread(target=_commit_worker, name='git-commit-worker', daemon=True)
+    _commit_thread.start()
+    return _commit_thread
+
+def stop_commit_worker(timeout=None):
+    """Push anything still queued, then stop the worker. Returns False if it timed out."""
+    if _commit_thread is None or not _commit_thread.is_alive():
+        return True
+    _commit_queue.put(_STOP)
+    _commit_thread.join(timeout)
+    return not _commit_thread.is_alive()
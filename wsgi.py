@@ -0,0 +1,17 @@
+"""
+WSGI entry point for running the admin panel under a production server:
+
+    gunicorn -k gthread -w 1 --threads 8 --timeout 120 --graceful-timeout 150 wsgi:application
+
+Keep a single worker process. Workflow state, queued commits and the
+Socket.IO clients all live in memory, so use threads for concurrency.
+Tunnels are not started here; expose the port yourself.
+
+Queued commits are pushed from an atexit hook when the worker stops, so
+give it a graceful timeout longer than COMMIT_FLUSH_TIMEOUT. The /shutdown
+route stops the gunicorn arbiter, not just the worker.
+"""
+from admin_panel import app, prepare_panel
+
+prepare_panel()
+application = app